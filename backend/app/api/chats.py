@@ -1,23 +1,58 @@
-from fastapi import APIRouter
+from typing import Iterator
 
-from app.db.sqlite import delete_chat, get_messages, list_chats
+import orjson
+from fastapi import APIRouter, Response
+from fastapi.responses import StreamingResponse
 
-router = APIRouter(prefix="/chats", tags=["chats"])
+from app.db.sqlite import delete_chat_async, iter_messages, list_chats
 
+router = APIRouter(prefix="/chats", tags=["chats"])
 
+# Flush the JSON body in chunks of roughly this size
+_STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _stream_messages(chat_id: int) -> Iterator[bytes]:
+    """Encode {"messages": [...]} incrementally as rows come off the cursor."""
+    buf = bytearray(b'{"messages":[')
+    first = True
+    for role, content, created_at in iter_messages(chat_id):
+        if not first:
+            buf += b","
+        first = False
+        buf += orjson.dumps(
+            {"role": role, "content": content, "created_at": created_at}
+        )
+        if len(buf) >= _STREAM_CHUNK_BYTES:
+            yield bytes(buf)
+            buf.clear()
+    buf += b"]}"
+    yield bytes(buf)
+
+
+# Plain def: the pooled reader may block, so FastAPI runs this in its threadpool
 @router.get("")
-async def chats():
-    rows = list(list_chats())
-    return {"chats": [dict(r) for r in rows]}
+def chats():
+    rows = list_chats()
+    body = orjson.dumps(
+        {
+            "chats": [
+                {"id": chat_id, "title": title, "updated_at": updated_at}
+                for chat_id, title, updated_at in rows
+            ]
+        }
+    )
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/{chat_id}")
 async def chat_messages(chat_id: int):
-    rows = list(get_messages(chat_id))
-    return {"messages": [dict(r) for r in rows]}
+    return StreamingResponse(
+        _stream_messages(chat_id), media_type="application/json"
+    )
 
 
 @router.delete("/{chat_id}")
 async def delete_chat_route(chat_id: int):
-    delete_chat(chat_id)
+    await delete_chat_async(chat_id)
     return {"ok": True}
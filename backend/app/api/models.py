@@ -2,13 +2,139 @@
 
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import StreamingResponse
-import json
+from collections import OrderedDict
+from typing import AsyncIterator
+import asyncio
+import hashlib
+import orjson
 from app.providers.opensource import get_opensource_provider
-from app.db.sqlite import create_chat, add_message, touch_chat
+from app.db.sqlite import (
+    add_message_async,
+    create_chat_async,
+    create_chat_with_first_message_async,
+    touch_chat_async,
+)
 
 
 router = APIRouter(prefix="/models", tags=["models"])
 
+# Keep intermediaries from caching or buffering the token stream
+_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _ensure_async_stream(stream):
+    """Reject sync iterators, which would be driven through the threadpool."""
+    if not hasattr(stream, "__aiter__"):
+        raise TypeError(
+            f"stream_chat must return an async iterator, got {type(stream).__name__}"
+        )
+    return stream
+
+
+# Exact-match cache of completed replies keyed by (model, messages)
+RESPONSE_CACHE_SIZE = 256
+_REPLAY_CHUNK_CHARS = 256
+_response_cache: "OrderedDict[bytes, str]" = OrderedDict()
+
+
+def _response_cache_key(model: str, messages: list) -> bytes:
+    payload = orjson.dumps(messages, option=orjson.OPT_SORT_KEYS) + model.encode()
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def _get_cached_response(key: bytes):
+    text = _response_cache.get(key)
+    if text is not None:
+        _response_cache.move_to_end(key)
+    return text
+
+
+def _store_cached_response(key: bytes, text: str) -> None:
+    _response_cache[key] = text
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > RESPONSE_CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+
+async def _replay_response(text: str):
+    """Re-stream a cached reply in chunks, matching stream_chat's output."""
+    for i in range(0, len(text), _REPLAY_CHUNK_CHARS):
+        yield text[i : i + _REPLAY_CHUNK_CHARS]
+        await asyncio.sleep(0)
+
+
+# Frames closer together than this are merged, up to this many bytes per send
+_COALESCE_BYTES = 4096
+_COALESCE_SECONDS = 0.005
+
+
+async def _coalesce(frames: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Send frames as they arrive, merging only those that land in a burst.
+
+    A frame arriving at least _COALESCE_SECONDS after the previous send goes
+    out immediately. Faster frames are held until that window closes or
+    _COALESCE_BYTES accumulate, so at most one send happens per window.
+    """
+    it = frames.__aiter__()
+    # The opening meta frame never starts a window, so the first token is
+    # not held back behind it
+    try:
+        yield await it.__anext__()
+    except StopAsyncIteration:
+        return
+
+    loop = asyncio.get_running_loop()
+    out = bytearray()
+    last_sent = float("-inf")
+    pending = None
+    try:
+        while True:
+            # Idle: wait for the next frame without a timer
+            try:
+                frame = await (pending if pending is not None else it.__anext__())
+            except StopAsyncIteration:
+                return
+            finally:
+                pending = None
+            if loop.time() - last_sent >= _COALESCE_SECONDS:
+                yield frame
+                last_sent = loop.time()
+                continue
+
+            # Burst: collect until the window closes or the buffer fills
+            out += frame
+            deadline = last_sent + _COALESCE_SECONDS
+            exhausted = False
+            while len(out) < _COALESCE_BYTES:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                if pending is None:
+                    pending = asyncio.ensure_future(it.__anext__())
+                done, _ = await asyncio.wait((pending,), timeout=timeout)
+                if not done:
+                    # Keep the read in flight; it is picked up once idle
+                    break
+                task, pending = pending, None
+                try:
+                    out += task.result()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                except Exception:
+                    yield bytes(out)
+                    raise
+            yield bytes(out)
+            out.clear()
+            last_sent = loop.time()
+            if exhausted:
+                return
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await it.aclose()
+
 
 @router.get("")
 async def list_all_models():
@@ -27,7 +153,10 @@ async def list_all_models():
 @router.post("/chat/stream")
 async def chat_stream(request: Request):
     """Stream chat from an OpenSource model."""
-    body = await request.json()
+    try:
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail="Invalid JSON body") from exc
     model = body.get("model")
     messages = body.get("messages")
     chat_id = body.get("chat_id")
@@ -61,40 +190,61 @@ async def chat_stream(request: Request):
             ),
         )
 
+    cache_key = _response_cache_key(model, messages)
+    cached = _get_cached_response(cache_key)
+    if cached is not None:
+        stream = _replay_response(cached)
+    else:
+        stream = _ensure_async_stream(provider.stream_chat(model, messages))
+
+    last = messages[-1] if messages else None
+    user_turn = last if last and last.get("role") == "user" else None
+
     # Create chat if needed
     if not chat_id:
-        first_user = next((m for m in messages if m.get("role") == "user"), None)
+        first_user = None
+        for m in messages:
+            if m.get("role") == "user":
+                first_user = m
+                break
         title = first_user.get("content", "New Chat")[:60] if first_user else None
-        chat_id = create_chat(title)
+        if user_turn is not None:
+            # New chat and its opening message land in a single transaction
+            chat_id = await create_chat_with_first_message_async(
+                title, user_turn.get("content", "")
+            )
+        else:
+            chat_id = await create_chat_async(title)
+    elif user_turn is not None:
+        # Persist user message (add_message also touches the chat)
+        await add_message_async(int(chat_id), "user", user_turn.get("content", ""))
     else:
-        touch_chat(int(chat_id))
-
-    # Persist user message
-    last = messages[-1] if messages else None
-    if last and last.get("role") == "user":
-        add_message(int(chat_id), "user", last.get("content", ""))
+        await touch_chat_async(int(chat_id))
 
-    async def combined_stream():
+    async def combined_stream() -> AsyncIterator[bytes]:
         # Emit meta line with chat_id
-        yield json.dumps({"type": "meta", "chat_id": chat_id}) + "\n"
-        assistant_accum = ""
+        yield orjson.dumps(
+            {"type": "meta", "chat_id": chat_id}, option=orjson.OPT_APPEND_NEWLINE
+        )
+        parts: list[str] = []
 
-        async for chunk in provider.stream_chat(model, messages):
-            if chunk.endswith("\n"):
-                yield chunk
-                try:
-                    evt = json.loads(chunk)
-                    if evt.get("type") == "content":
-                        assistant_accum += evt.get("delta", "")
-                except Exception:
-                    pass
-            else:
-                assistant_accum += chunk
-                yield chunk
+        async for delta in stream:
+            # The only place stream frames are encoded
+            yield orjson.dumps(
+                {"type": "content", "delta": delta}, option=orjson.OPT_APPEND_NEWLINE
+            )
+            parts.append(delta)
 
-        # Save assistant message
+        # Save assistant message (add_message also touches the chat)
+        assistant_accum = "".join(parts)
         if assistant_accum:
-            add_message(int(chat_id), "assistant", assistant_accum)
-            touch_chat(int(chat_id))
-
-    return StreamingResponse(combined_stream(), media_type="text/plain")
+            await add_message_async(int(chat_id), "assistant", assistant_accum)
+            # Only reached when the stream completed without error
+            if cached is None:
+                _store_cached_response(cache_key, assistant_accum)
+
+    return StreamingResponse(
+        _coalesce(combined_stream()),
+        media_type="application/x-ndjson",
+        headers=_STREAM_HEADERS,
+    )
@@ -3,25 +3,38 @@ from fastapi import APIRouter, HTTPException, Header
 from typing import Optional
 from urllib.parse import unquote
 import shutil
+import time
 from pathlib import Path
 from app.providers.opensource import get_opensource_provider
 
 router = APIRouter(prefix="/opensource", tags=["opensource"])
 
+# The frontend polls disk space; a few seconds of staleness is fine
+_DISK_CACHE_TTL = 5.0
+_disk_cache: Optional[tuple] = None  # (timestamp, result)
+_cache_parent_ready = False
+
 
 @router.get("/disk-space")
 async def get_disk_space():
     """Get available disk space in GB."""
+    global _disk_cache, _cache_parent_ready
+    now = time.monotonic()
+    if _disk_cache is not None and now - _disk_cache[0] < _DISK_CACHE_TTL:
+        return _disk_cache[1]
+
     try:
         # Get free space from home directory (where models are typically cached)
         cache_dir = Path.home() / ".cache" / "llama-cpp-python"
-        cache_dir.parent.mkdir(parents=True, exist_ok=True)
+        if not _cache_parent_ready:
+            cache_dir.parent.mkdir(parents=True, exist_ok=True)
+            _cache_parent_ready = True
         
         stat = shutil.disk_usage(cache_dir.parent)
         free_gb = stat.free / (1024 ** 3)  # Convert bytes to GB
         total_gb = stat.total / (1024 ** 3)
         
-        return {
+        result = {
             "free_gb": round(free_gb, 2),
             "total_gb": round(total_gb, 2),
             "used_gb": round(total_gb - free_gb, 2)
@@ -29,6 +42,9 @@ async def get_disk_space():
     except Exception as e:
         return {"free_gb": 0, "total_gb": 0, "used_gb": 0, "error": str(e)}
 
+    _disk_cache = (now, result)
+    return result
+
 
 @router.get("/models/{model_id:path}/status")
 async def get_model_status(model_id: str):
@@ -1,11 +1,15 @@
-from fastapi import FastAPI, Request, HTTPException
+import orjson
+from fastapi import FastAPI, Request, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app.config.config import ALLOWED_ORIGINS
 from app.api import models, opensource, chats
-from app.db.sqlite import init_db
+from app.db.sqlite import close_db, init_db
 from app.providers.opensource import get_opensource_provider
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+
+_HEALTH_BODY = orjson.dumps({"status": "ok"})
 
 # Add CORS middleware for cross-origin requests
 app.add_middleware(
@@ -29,10 +33,18 @@ def _startup():
         print(f"⚠️  OpenSource provider not ready: {e}")
 
 
+@app.on_event("shutdown")
+def _shutdown():
+    close_db()
+    # Only release models if the provider was ever created
+    if get_opensource_provider.cache_info().currsize:
+        get_opensource_provider().close()
+
+
 @app.get("/health")
 async def health():
     """Health check endpoint."""
-    return {"status": "ok"}
+    return Response(content=_HEALTH_BODY, media_type="application/json")
 
 
 app.include_router(chats.router)
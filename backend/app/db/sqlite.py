@@ -1,9 +1,14 @@
 import os
 import sys
+import asyncio
 import sqlite3
 import shutil
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Iterable
+from typing import Any, Callable, Iterator, List, Optional
 from appdirs import user_data_dir
 
 
@@ -40,16 +45,139 @@ def get_template_db_path() -> Optional[Path]:
 
 DB_PATH = str(get_db_path())
 
+# Per-connection settings. journal_mode is persisted in the database file,
+# so it only needs to be switched once per file.
+_CONN_PRAGMAS = """
+PRAGMA synchronous = NORMAL;
+PRAGMA busy_timeout = 5000;
+PRAGMA temp_store = MEMORY;
+PRAGMA cache_size = -65536;
+PRAGMA foreign_keys = ON;
+"""
+_wal_db_path: Optional[str] = None
+STATEMENT_CACHE_SIZE = 256
 
-def get_conn() -> sqlite3.Connection:
-    """Get database connection with foreign keys enabled."""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    # Enable foreign key constraints
-    conn.execute("PRAGMA foreign_keys = ON")
+# Connections are opened once and reused for the process lifetime: a single
+# read-write connection (SQLite allows one writer at a time) plus a small pool
+# of read-only connections, which WAL lets run alongside the writer.
+READ_POOL_SIZE = 4
+# Seconds a caller waits for a reader to be returned before giving up
+READ_POOL_TIMEOUT = 5.0
+# Rows fetched per reader checkout when paging through a chat's messages
+MESSAGE_BATCH_SIZE = 256
+_write_conn: Optional[sqlite3.Connection] = None
+_write_lock = threading.Lock()
+_read_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=READ_POOL_SIZE)
+_read_conns: list = []
+_pool_lock = threading.Lock()
+
+# Async callers funnel writes through one lock and one worker thread so they
+# never block the event loop or contend for SQLite's write lock.
+DB_WRITE_LOCK = asyncio.Lock()
+_DB_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+
+
+def get_conn(read_only: bool = False) -> sqlite3.Connection:
+    """Get database connection in WAL mode with foreign keys enabled.
+
+    ``read_only`` opens the file with ``mode=ro`` so a reader can never take
+    the write lock; the database must already exist.
+    """
+    global _wal_db_path
+    target, uri = DB_PATH, False
+    if read_only:
+        target, uri = f"{Path(DB_PATH).resolve().as_uri()}?mode=ro", True
+    # Autocommit mode: write helpers open their own transactions explicitly
+    # Rows come back as plain tuples; callers unpack the selected columns.
+    # Connections are long-lived, so sqlite3's per-connection prepared
+    # statement cache keeps every helper's SQL compiled after first use.
+    conn = sqlite3.connect(
+        target,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        uri=uri,
+    )
+    if not read_only and _wal_db_path != DB_PATH:
+        conn.execute("PRAGMA journal_mode = WAL")
+        _wal_db_path = DB_PATH
+    conn.executescript(_CONN_PRAGMAS)
     return conn
 
 
+@contextmanager
+def write_conn() -> Iterator[sqlite3.Connection]:
+    """Borrow the shared writer connection, serialized across threads."""
+    global _write_conn
+    with _write_lock:
+        if _write_conn is None:
+            _write_conn = get_conn()
+        yield _write_conn
+
+
+@contextmanager
+def read_conn() -> Iterator[sqlite3.Connection]:
+    """Borrow a reader connection from the pool, opening it on first use."""
+    try:
+        conn = _read_pool.get_nowait()
+    except queue.Empty:
+        if _write_conn is None:
+            # The writer creates the file and switches it to WAL before any
+            # read-only connection is opened against it
+            with write_conn():
+                pass
+        with _pool_lock:
+            if len(_read_conns) < READ_POOL_SIZE:
+                conn = get_conn(read_only=True)
+                _read_conns.append(conn)
+            else:
+                conn = None
+        if conn is None:
+            try:
+                conn = _read_pool.get(timeout=READ_POOL_TIMEOUT)
+            except queue.Empty:
+                raise sqlite3.OperationalError(
+                    "timed out waiting for a free database reader"
+                ) from None
+    try:
+        yield conn
+    finally:
+        _read_pool.put(conn)
+
+
+def close_db() -> None:
+    """Close the pooled connections (used on shutdown)."""
+    global _write_conn
+    with _write_lock:
+        if _write_conn is not None:
+            _write_conn.execute("PRAGMA optimize")
+            _write_conn.close()
+            _write_conn = None
+    with _pool_lock:
+        while True:
+            try:
+                _read_pool.get_nowait()
+            except queue.Empty:
+                break
+        for conn in _read_conns:
+            conn.close()
+        _read_conns.clear()
+
+
+@contextmanager
+def _write_txn() -> Iterator[sqlite3.Cursor]:
+    """Run a write inside BEGIN IMMEDIATE so the write lock is taken upfront."""
+    with write_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            yield cur
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
 def init_db() -> None:
     """Initialize database. Copies template DB on first run if it exists."""
     db_path = get_db_path()
@@ -59,113 +187,152 @@ def init_db() -> None:
         template_path = get_template_db_path()
         if template_path and template_path.exists():
             shutil.copy2(template_path, db_path)
-            # After copying, ensure foreign keys are enabled
-            conn = get_conn()
-            conn.execute("PRAGMA foreign_keys = ON")
-            conn.commit()
-            conn.close()
-            return
     
-    # Create tables if they don't exist (for new installations)
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS chats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chat_id INTEGER NOT NULL,
-            role TEXT NOT NULL,
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(chat_id) REFERENCES chats(id) ON DELETE CASCADE
-        );
-        """
-    )
-    # Enable foreign key constraints
-    cur.execute("PRAGMA foreign_keys = ON")
-    conn.commit()
-    conn.close()
+    # Create tables and indexes if they don't exist (the template DB and
+    # older installs get the indexes added here too)
+    with write_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(chat_id) REFERENCES chats(id) ON DELETE CASCADE
+            );
+            """
+        )
+        # Serves iter_messages (WHERE chat_id=? ORDER BY id) and list_chats
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_chat_id_id ON messages(chat_id, id)"
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chats_updated_at ON chats(updated_at DESC)"
+        )
+        # Collect planner statistics once; PRAGMA optimize refreshes them on close
+        has_stats = cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'"
+        ).fetchone()
+        if not has_stats:
+            cur.execute("ANALYZE")
 
 
 def create_chat(title: Optional[str]) -> int:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO chats(title) VALUES(?)", (title,))
-    chat_id = cur.lastrowid
-    conn.commit()
-    conn.close()
+    with _write_txn() as cur:
+        cur.execute("INSERT INTO chats(title) VALUES(?)", (title,))
+        chat_id = cur.lastrowid
+    return int(chat_id)
+
+
+def create_chat_with_first_message(title: Optional[str], content: str) -> int:
+    """Create a chat and store its first user message in one transaction."""
+    with _write_txn() as cur:
+        cur.execute("INSERT INTO chats(title) VALUES(?)", (title,))
+        chat_id = cur.lastrowid
+        cur.execute(
+            "INSERT INTO messages(chat_id, role, content) VALUES(?, ?, ?)",
+            (chat_id, "user", content),
+        )
     return int(chat_id)
 
 
 def touch_chat(chat_id: int, title: Optional[str] = None) -> None:
-    conn = get_conn()
-    cur = conn.cursor()
-    if title is None:
+    with _write_txn() as cur:
+        if title is None:
+            cur.execute(
+                "UPDATE chats SET updated_at=CURRENT_TIMESTAMP WHERE id=?", (chat_id,)
+            )
+        else:
+            cur.execute(
+                "UPDATE chats SET title=COALESCE(title, ?), updated_at=CURRENT_TIMESTAMP WHERE id=?",
+                (title, chat_id),
+            )
+
+
+def add_message(chat_id: int, role: str, content: str) -> None:
+    """Insert a message and bump the chat's updated_at in one transaction."""
+    with _write_txn() as cur:
         cur.execute(
-            "UPDATE chats SET updated_at=CURRENT_TIMESTAMP WHERE id=?", (chat_id,)
+            "INSERT INTO messages(chat_id, role, content) VALUES(?, ?, ?)",
+            (chat_id, role, content),
         )
-    else:
         cur.execute(
-            "UPDATE chats SET title=COALESCE(title, ?), updated_at=CURRENT_TIMESTAMP WHERE id=?",
-            (title, chat_id),
+            "UPDATE chats SET updated_at=CURRENT_TIMESTAMP WHERE id=?", (chat_id,)
         )
-    conn.commit()
-    conn.close()
 
 
-def add_message(chat_id: int, role: str, content: str) -> None:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO messages(chat_id, role, content) VALUES(?, ?, ?)",
-        (chat_id, role, content),
-    )
-    cur.execute("UPDATE chats SET updated_at=CURRENT_TIMESTAMP WHERE id=?", (chat_id,))
-    conn.commit()
-    conn.close()
+def list_chats() -> List[tuple]:
+    """Return (id, title, updated_at) rows, most recently updated first."""
+    with read_conn() as conn:
+        return conn.execute(
+            "SELECT id, COALESCE(title, 'New Chat') as title, updated_at FROM chats ORDER BY updated_at DESC"
+        ).fetchall()
 
 
-def list_chats() -> Iterable[sqlite3.Row]:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, COALESCE(title, 'New Chat') as title, updated_at FROM chats ORDER BY updated_at DESC"
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
+def iter_messages(chat_id: int) -> Iterator[tuple]:
+    """Yield a chat's messages in pages of MESSAGE_BATCH_SIZE rows.
 
-def get_messages(chat_id: int) -> Iterable[sqlite3.Row]:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT role, content, created_at FROM messages WHERE chat_id=? ORDER BY id ASC",
-        (chat_id,),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    The reader goes back to the pool before each page is yielded, so a slow
+    consumer never holds a pooled connection or an open read transaction.
+    """
+    last_id = 0
+    while True:
+        with read_conn() as conn:
+            rows = conn.execute(
+                "SELECT id, role, content, created_at FROM messages"
+                " WHERE chat_id=? AND id>? ORDER BY id ASC LIMIT ?",
+                (chat_id, last_id, MESSAGE_BATCH_SIZE),
+            ).fetchall()
+        for _, role, content, created_at in rows:
+            yield role, content, created_at
+        if len(rows) < MESSAGE_BATCH_SIZE:
+            return
+        last_id = rows[-1][0]
 
 
 def delete_chat(chat_id: int) -> None:
     """Delete a chat and all its messages (CASCADE handles messages)."""
-    conn = get_conn()
-    cur = conn.cursor()
-    # First delete messages explicitly to ensure they're removed
-    # (CASCADE should handle this, but being explicit)
-    cur.execute("DELETE FROM messages WHERE chat_id=?", (chat_id,))
-    # Then delete the chat
-    cur.execute("DELETE FROM chats WHERE id=?", (chat_id,))
-    conn.commit()
-    conn.close()
+    # foreign_keys=ON is set on every connection, so the chat row's
+    # ON DELETE CASCADE removes its messages in the same statement
+    with _write_txn() as cur:
+        cur.execute("DELETE FROM chats WHERE id=?", (chat_id,))
+
+
+async def _run_write(fn: Callable[..., Any], *args: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    async with DB_WRITE_LOCK:
+        return await loop.run_in_executor(_DB_EXECUTOR, fn, *args)
+
+
+async def create_chat_async(title: Optional[str]) -> int:
+    return await _run_write(create_chat, title)
+
+
+async def create_chat_with_first_message_async(
+    title: Optional[str], content: str
+) -> int:
+    return await _run_write(create_chat_with_first_message, title, content)
+
+
+async def touch_chat_async(chat_id: int, title: Optional[str] = None) -> None:
+    await _run_write(touch_chat, chat_id, title)
+
+
+async def add_message_async(chat_id: int, role: str, content: str) -> None:
+    await _run_write(add_message, chat_id, role, content)
+
+
+async def delete_chat_async(chat_id: int) -> None:
+    await _run_write(delete_chat, chat_id)
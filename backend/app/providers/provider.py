@@ -1,10 +1,14 @@
 """OpenSource LLM provider using llama-cpp-python."""
 
-from typing import List, Dict, Optional, AsyncGenerator
+from typing import List, Dict, Optional, AsyncGenerator, Tuple
+from collections import OrderedDict
 from pathlib import Path
-import json
 import asyncio
 import os
+import threading
+import time
+
+import orjson
 
 _IMPORT_ERROR = None
 try:
@@ -21,6 +25,30 @@ except Exception as e:
     Llama = None
     _IMPORT_ERROR = str(e)
 
+# Imported once here: huggingface_hub is slow to import on first use
+try:
+    from huggingface_hub import hf_hub_download, try_to_load_from_cache
+except ImportError:
+    hf_hub_download = None
+    try_to_load_from_cache = None
+
+
+def _require_hf_hub() -> None:
+    if hf_hub_download is None:
+        raise ImportError("huggingface_hub not installed")
+
+
+def _set_done(fut: "asyncio.Future") -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+# Models kept loaded at once; older ones are released least-recently-used first
+MAX_LOADED_MODELS = 2
+
+# How long a cached download check stays valid (files can change outside the app)
+DOWNLOAD_STATUS_TTL = 30.0
+
 
 class OpenSourceProvider:
     """Provider for local open-source models via llama-cpp-python."""
@@ -29,7 +57,11 @@ class OpenSourceProvider:
     def name(self) -> str:
         return "opensource"
 
-    def __init__(self, registry_path: Optional[str] = None):
+    def __init__(
+        self,
+        registry_path: Optional[str] = None,
+        max_loaded_models: int = MAX_LOADED_MODELS,
+    ):
         """Initialize OpenSource provider."""
         if not HAS_LLAMA_CPP:
             error_msg = "llama-cpp-python not installed. Install with: pip install llama-cpp-python"
@@ -46,52 +78,49 @@ class OpenSourceProvider:
         if not self.registry_path.exists():
             raise FileNotFoundError(f"Registry not found: {self.registry_path}")
 
-        with open(self.registry_path, "r") as f:
-            self.registry = json.load(f)
-
-        # Cache loaded models
-        self._model_cache: Dict[str, Llama] = {}
-
-        # Track download status
-        self._download_cache: Dict[str, bool] = {}
+        with open(self.registry_path, "rb") as f:
+            self.registry = orjson.loads(f.read())
+        # Index by repo_id for O(1) lookups (first entry wins, as with a scan)
+        self._by_repo_id: Dict[str, Dict] = {
+            m["repo_id"]: m for m in reversed(self.registry)
+        }
+
+        # Cache loaded models (LRU order, bounded to keep resident memory in check)
+        self._model_cache: "OrderedDict[str, Llama]" = OrderedDict()
+        self._max_loaded_models = max(1, max_loaded_models)
+        # Guards _model_cache: lookups run on the event loop while loads,
+        # evictions and deletes run in worker threads
+        self._cache_lock = threading.Lock()
+        # One lock per model so concurrent first requests load it only once
+        self._load_locks: Dict[str, asyncio.Lock] = {}
+
+        # Track download status: cache_key -> (checked_at, downloaded)
+        self._download_cache: Dict[str, Tuple[float, bool]] = {}
 
     def get_model_info(self, model_id: str) -> Optional[Dict]:
         """Public helper to fetch model info from the registry."""
         # Model ID format: "opensource:repo_id" or just "repo_id"
-        actual_id = model_id.replace("opensource:", "", 1)
-        for model in self.registry:
-            if model["repo_id"] == actual_id:
-                return model
-        return None
+        return self._by_repo_id.get(model_id.removeprefix("opensource:"))
 
     def check_model_downloaded(self, repo_id: str, filename: str) -> bool:
         """Check if model file is already downloaded locally."""
         cache_key = f"{repo_id}:{filename}"
-        if cache_key in self._download_cache:
-            return self._download_cache[cache_key]
+        cached = self._download_cache.get(cache_key)
+        if cached is not None and time.monotonic() - cached[0] < DOWNLOAD_STATUS_TTL:
+            return cached[1]
 
         # Check HuggingFace cache (where llama-cpp downloads from)
         try:
-            from huggingface_hub import hf_hub_download
+            _require_hf_hub()
 
-            # HuggingFace cache is usually ~/.cache/huggingface/hub
-            # Try to get the cached file path without downloading
-            try:
-                # This will return the cached path if exists, or raise if not cached
-                cached_path = hf_hub_download(
-                    repo_id=repo_id,
-                    filename=filename,
-                    cache_dir=None,  # Use default cache
-                    local_files_only=True,  # Only check local cache, don't download
-                )
-                from pathlib import Path
+            # HuggingFace cache is usually ~/.cache/huggingface/hub.
+            # try_to_load_from_cache only resolves the snapshot path: it never
+            # downloads and returns None/_CACHED_NO_EXIST on a miss instead of
+            # raising, unlike hf_hub_download(local_files_only=True)
+            cached_path = try_to_load_from_cache(repo_id=repo_id, filename=filename)
+            exists = isinstance(cached_path, str) and os.path.exists(cached_path)
 
-                exists = Path(cached_path).exists() if cached_path else False
-            except Exception:
-                # If local_files_only=True fails, file doesn't exist locally
-                exists = False
-
-            self._download_cache[cache_key] = exists
+            self._download_cache[cache_key] = (time.monotonic(), exists)
             return exists
         except Exception as e:
             # If check fails, assume not downloaded
@@ -105,8 +134,9 @@ class OpenSourceProvider:
     ) -> Llama:
         """Load a model (with caching). Downloads automatically if not present."""
         cache_key = f"{repo_id}:{filename}"
-        if cache_key in self._model_cache:
-            return self._model_cache[cache_key]
+        llm = self._cached_model(cache_key)
+        if llm is not None:
+            return llm
 
         # Llama.from_pretrained will download automatically if not present
         llm = Llama.from_pretrained(
@@ -119,13 +149,42 @@ class OpenSourceProvider:
                 else str(Path.home() / ".cache" / "llama-cpp-python")
             ),
         )
-        self._model_cache[cache_key] = llm
-        self._download_cache[cache_key] = True  # Mark as downloaded after loading
+        with self._cache_lock:
+            self._model_cache[cache_key] = llm
+            self._model_cache.move_to_end(cache_key)
+            while len(self._model_cache) > self._max_loaded_models:
+                # Dropping the last reference lets llama-cpp free the context
+                # and mmap; a stream still using the model keeps it alive
+                self._model_cache.popitem(last=False)
+        # Mark as downloaded after loading
+        self._download_cache[cache_key] = (time.monotonic(), True)
         return llm
 
+    def _cached_model(self, cache_key: str) -> Optional[Llama]:
+        """Return a loaded model and mark it most recently used."""
+        with self._cache_lock:
+            llm = self._model_cache.get(cache_key)
+            if llm is not None:
+                self._model_cache.move_to_end(cache_key)
+            return llm
+
+    def _drop_model(self, cache_key: str) -> None:
+        with self._cache_lock:
+            self._model_cache.pop(cache_key, None)
+
+    async def _get_model(self, repo_id: str, filename: str) -> Llama:
+        """Return a loaded model, loading it off the event loop if needed."""
+        cache_key = f"{repo_id}:{filename}"
+        llm = self._cached_model(cache_key)
+        if llm is not None:
+            return llm
+        lock = self._load_locks.setdefault(cache_key, asyncio.Lock())
+        async with lock:
+            # _load_model returns the cached instance if another request won
+            return await asyncio.to_thread(self._load_model, repo_id, filename)
+
     async def download_model(self, repo_id: str, filename: str) -> Dict[str, str]:
         """Download/prepare a model file."""
-        loop = asyncio.get_event_loop()
 
         def download_sync():
             """Download model synchronously."""
@@ -142,26 +201,24 @@ class OpenSourceProvider:
             except Exception as e:
                 return {"status": "error", "error": str(e)}
 
-        result = await loop.run_in_executor(None, download_sync)
+        result = await asyncio.to_thread(download_sync)
         if result["status"] == "downloaded":
             cache_key = f"{repo_id}:{filename}"
-            self._download_cache[cache_key] = True
+            self._download_cache[cache_key] = (time.monotonic(), True)
         return result
 
     async def delete_model(self, repo_id: str, filename: str) -> Dict[str, str]:
         """Delete a downloaded model file from HuggingFace cache."""
-        loop = asyncio.get_event_loop()
 
         def delete_sync():
             """Delete model synchronously."""
             try:
-                from huggingface_hub import hf_hub_download
+                _require_hf_hub()
 
                 cache_key = f"{repo_id}:{filename}"
 
                 # Remove from memory cache if loaded
-                if cache_key in self._model_cache:
-                    del self._model_cache[cache_key]
+                self._drop_model(cache_key)
 
                 # Try to get the cached file path
                 try:
@@ -213,8 +270,7 @@ class OpenSourceProvider:
                     # Clear cache entries anyway
                     if cache_key in self._download_cache:
                         del self._download_cache[cache_key]
-                    if cache_key in self._model_cache:
-                        del self._model_cache[cache_key]
+                    self._drop_model(cache_key)
 
                     # Check if it's a "not found" type error
                     if (
@@ -230,12 +286,23 @@ class OpenSourceProvider:
             except Exception as e:
                 return {"status": "error", "error": str(e)}
 
-        return await loop.run_in_executor(None, delete_sync)
+        return await asyncio.to_thread(delete_sync)
 
     async def list_models(self, **kwargs) -> List[Dict]:
         """List available models from registry."""
+        # Download checks touch the filesystem; run them off the event loop
+        # and in parallel rather than one after another
+        statuses = await asyncio.gather(
+            *(
+                asyncio.to_thread(
+                    self.check_model_downloaded, model["repo_id"], model["filename"]
+                )
+                for model in self.registry
+            )
+        )
+
         models = []
-        for model in self.registry:
+        for model, is_downloaded in zip(self.registry, statuses):
             # Use friendly name if provided, otherwise derive from repo_id
             repo_id = model["repo_id"]
             # Extract model name (e.g., "Qwen2.5-0.5B-Instruct-GGUF" -> "Qwen 2.5 0.5B Instruct")
@@ -252,9 +319,6 @@ class OpenSourceProvider:
                         .replace("-", " ")
                     )
 
-            # Check download status
-            is_downloaded = self.check_model_downloaded(repo_id, model["filename"])
-
             models.append(
                 {
                     "id": f"opensource:{repo_id}",
@@ -274,76 +338,95 @@ class OpenSourceProvider:
     async def stream_chat(
         self, model: str, messages: List[Dict[str, str]], **kwargs
     ) -> AsyncGenerator[str, None]:
-        """Stream chat completion from local model."""
+        """Stream chat completion from local model, yielding content deltas.
+
+        Wire encoding is left to the caller so each token is serialized once.
+        """
         # Get model info
         model_info = self.get_model_info(model)
         if not model_info:
             raise ValueError(f"Model not found in registry: {model}")
 
         # Load model (will auto-download if not present, but may take time)
-        llm = self._load_model(model_info["repo_id"], model_info["filename"])
+        llm = await self._get_model(model_info["repo_id"], model_info["filename"])
 
         # llama-cpp-python's create_chat_completion with stream=True returns a generator
         # It's OpenAI-compatible format: {"choices": [{"delta": {"content": "..."}, "finish_reason": null}]}
-        def generate_chunks():
-            """Generator function that runs in thread."""
-            response = llm.create_chat_completion(
-                messages=messages, stream=True, **kwargs
-            )
-            for chunk in response:
-                yield chunk
-
-        # Use queue to bridge sync generator to async
-        import queue
+        loop = asyncio.get_running_loop()
+        chunk_queue: asyncio.Queue = asyncio.Queue()
+        finished = loop.create_future()
+        stop = threading.Event()
 
-        chunk_queue = queue.Queue()
-        loop = asyncio.get_event_loop()
-        done = False
+        def emit(item) -> None:
+            try:
+                loop.call_soon_threadsafe(chunk_queue.put_nowait, item)
+            except RuntimeError:
+                # Event loop already closed; nobody is listening
+                stop.set()
 
         def run_inference():
-            """Run inference in thread and put chunks in queue."""
+            """Run inference on a dedicated thread, handing deltas to the loop.
+
+            Chunks without content (role-only deltas, empty keep-alives) are
+            dropped here so they never cost an event-loop wakeup.
+            """
             try:
-                for chunk in generate_chunks():
-                    chunk_queue.put(chunk)
-                chunk_queue.put(None)  # Sentinel
+                response = llm.create_chat_completion(
+                    messages=messages, stream=True, **kwargs
+                )
+                for chunk in response:
+                    if stop.is_set():
+                        break
+                    # Parse OpenAI-compatible format: {"choices": [{"delta": {"content": "..."}}]}
+                    choice = chunk.get("choices", [{}])[0]
+                    delta = choice.get("delta", {}) or {}
+                    content = delta.get("content")
+                    if content:
+                        emit(content)
+                    # Check for finish reason
+                    if choice.get("finish_reason"):
+                        break
+                emit(None)  # Sentinel
             except Exception as e:
-                chunk_queue.put(("error", str(e)))
+                emit(e)
+            finally:
+                try:
+                    loop.call_soon_threadsafe(_set_done, finished)
+                except RuntimeError:
+                    pass
 
         # Start inference in background
-        executor_task = loop.run_in_executor(None, run_inference)
+        threading.Thread(
+            target=run_inference, name="llama-stream", daemon=True
+        ).start()
 
-        # Stream chunks as they arrive
+        # Stream deltas as they arrive
         try:
-            while not done:
-                # Use run_in_executor to wait for queue.get() without blocking event loop
-                chunk = await loop.run_in_executor(None, chunk_queue.get)
-
-                if chunk is None:
-                    done = True
-                    break
-                if isinstance(chunk, tuple) and chunk[0] == "error":
-                    raise Exception(chunk[1])
-
-                # Parse OpenAI-compatible format: {"choices": [{"delta": {"content": "..."}}]}
-                choice = chunk.get("choices", [{}])[0]
-                delta = choice.get("delta", {}) or {}
-                content = delta.get("content")
-
-                if content:
-                    yield json.dumps({"type": "content", "delta": content}) + "\n"
+            while True:
+                item = await chunk_queue.get()
 
-                # Check for finish reason
-                if choice.get("finish_reason"):
-                    done = True
+                if item is None:
                     break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
         finally:
-            # Wait for executor to finish
-            await executor_task
+            # Stop generating if the consumer went away, then wait for the
+            # thread to release the model before it can be used again
+            stop.set()
+            await finished
+
+    def close(self) -> None:
+        """Release all loaded models."""
+        with self._cache_lock:
+            models = list(self._model_cache.values())
+            self._model_cache.clear()
+        for llm in models:
+            close = getattr(llm, "close", None)
+            if close is not None:
+                close()
 
     def is_model_available(self, model_id: str) -> bool:
         """Check if model belongs to OpenSource provider."""
-        # Check if model_id starts with "opensource:" prefix
-        if model_id.startswith("opensource:"):
-            return self.get_model_info(model_id) is not None
-        # Also check without prefix for convenience
-        return self.get_model_info(f"opensource:{model_id}") is not None
+        # Accepts "opensource:repo_id" as well as a bare repo_id
+        return model_id.removeprefix("opensource:") in self._by_repo_id
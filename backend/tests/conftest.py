@@ -0,0 +1,15 @@
+import pytest
+
+from app.db import sqlite as db
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    db.close_db()
+    path = tmp_path / "data.sqlite3"
+    monkeypatch.setattr(db, "DB_PATH", str(path))
+    monkeypatch.setattr(db, "get_db_path", lambda: path)
+    monkeypatch.setattr(db, "get_template_db_path", lambda: None)
+    db.init_db()
+    yield
+    db.close_db()
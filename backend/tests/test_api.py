@@ -8,3 +8,29 @@ def test_health():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+
+def test_list_and_delete_chat(temp_db):
+    from app.db import sqlite as db
+
+    chat_id = db.create_chat_with_first_message("hello", "hi")
+
+    response = client.get("/chats")
+    assert response.status_code == 200
+    assert [c["id"] for c in response.json()["chats"]] == [chat_id]
+
+    response = client.delete(f"/chats/{chat_id}")
+    assert response.json() == {"ok": True}
+    assert client.get("/chats").json() == {"chats": []}
+
+
+def test_chat_messages_streams_every_page(temp_db, monkeypatch):
+    from app.db import sqlite as db
+
+    monkeypatch.setattr(db, "MESSAGE_BATCH_SIZE", 2)
+    chat_id = db.create_chat_with_first_message("hello", "m0")
+    for i in range(1, 5):
+        db.add_message(chat_id, "assistant", f"m{i}")
+
+    messages = client.get(f"/chats/{chat_id}").json()["messages"]
+    assert [m["content"] for m in messages] == ["m0", "m1", "m2", "m3", "m4"]
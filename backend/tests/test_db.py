@@ -0,0 +1,52 @@
+from contextlib import ExitStack
+import sqlite3
+
+import pytest
+
+from app.db import sqlite as db
+
+
+def test_delete_chat_cascades_to_messages(temp_db):
+    chat_id = db.create_chat_with_first_message("hello", "hi")
+    db.add_message(chat_id, "assistant", "hey")
+
+    db.delete_chat(chat_id)
+
+    assert list(db.iter_messages(chat_id)) == []
+    with db.read_conn() as conn:
+        count = conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE chat_id=?", (chat_id,)
+        ).fetchone()[0]
+    assert count == 0
+
+
+def test_read_conn_times_out_when_pool_is_exhausted(temp_db, monkeypatch):
+    monkeypatch.setattr(db, "READ_POOL_TIMEOUT", 0.05)
+    with ExitStack() as stack:
+        for _ in range(db.READ_POOL_SIZE):
+            stack.enter_context(db.read_conn())
+        with pytest.raises(sqlite3.OperationalError):
+            with db.read_conn():
+                pass
+
+    # Returned readers are reused rather than reopened
+    with db.read_conn():
+        pass
+    assert len(db._read_conns) == db.READ_POOL_SIZE
+
+
+def test_paused_message_streams_do_not_hold_readers(temp_db, monkeypatch):
+    monkeypatch.setattr(db, "MESSAGE_BATCH_SIZE", 2)
+    monkeypatch.setattr(db, "READ_POOL_TIMEOUT", 0.05)
+    chat_id = db.create_chat_with_first_message("hello", "m0")
+    for i in range(1, 5):
+        db.add_message(chat_id, "assistant", f"m{i}")
+
+    # More consumers paused mid-stream than there are pooled readers
+    streams = [db.iter_messages(chat_id) for _ in range(db.READ_POOL_SIZE + 1)]
+    for stream in streams:
+        assert next(stream)[1] == "m0"
+
+    assert [row[0] for row in db.list_chats()] == [chat_id]
+    for stream in streams:
+        assert [content for _, content, _ in stream] == ["m1", "m2", "m3", "m4"]
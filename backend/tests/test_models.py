@@ -0,0 +1,226 @@
+import asyncio
+from collections import OrderedDict
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import models
+from app.app import app
+
+client = TestClient(app)
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class FakeProvider:
+    def __init__(self, deltas, error=None, endless=False):
+        self.deltas = deltas
+        self.error = error
+        self.endless = endless
+        self.calls = 0
+
+    def get_model_info(self, model):
+        return {"repo_id": "fake/repo", "filename": "fake.gguf"}
+
+    def check_model_downloaded(self, repo_id, filename):
+        return True
+
+    async def stream_chat(self, model, messages):
+        self.calls += 1
+        while True:
+            for delta in self.deltas:
+                yield delta
+                await asyncio.sleep(0)
+            if not self.endless:
+                break
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    cache = OrderedDict()
+    monkeypatch.setattr(models, "_response_cache", cache)
+    return cache
+
+
+def _use_provider(monkeypatch, provider):
+    monkeypatch.setattr(models, "get_opensource_provider", lambda: provider)
+
+
+def _frames(body: bytes):
+    return [orjson.loads(line) for line in body.splitlines()]
+
+
+def _post(messages=MESSAGES):
+    return client.post(
+        "/models/chat/stream", json={"model": "opensource:fake", "messages": messages}
+    )
+
+
+def test_completed_stream_is_cached_and_replayed(temp_db, response_cache, monkeypatch):
+    provider = FakeProvider(["Hel", "lo"])
+    _use_provider(monkeypatch, provider)
+
+    first = _frames(_post().content)
+    assert first[0]["type"] == "meta"
+    assert "".join(f["delta"] for f in first[1:]) == "Hello"
+    assert list(response_cache.values()) == ["Hello"]
+
+    second = _frames(_post().content)
+    assert provider.calls == 1
+    assert second[0]["type"] == "meta"
+    assert second[0]["chat_id"] != first[0]["chat_id"]
+    assert second[1:] == [{"type": "content", "delta": "Hello"}]
+
+
+def test_failed_stream_is_not_cached(temp_db, response_cache, monkeypatch):
+    _use_provider(monkeypatch, FakeProvider(["Hel"], error=RuntimeError("boom")))
+
+    with pytest.raises(RuntimeError):
+        _post()
+    assert not response_cache
+
+
+def test_disconnected_stream_is_not_cached(temp_db, response_cache, monkeypatch):
+    _use_provider(monkeypatch, FakeProvider(["tok "], endless=True))
+
+    class FakeRequest:
+        async def body(self):
+            return orjson.dumps({"model": "opensource:fake", "messages": MESSAGES})
+
+    async def consume_then_disconnect():
+        response = await models.chat_stream(FakeRequest())
+        frames = response.body_iterator
+        await frames.__anext__()
+        await frames.__anext__()
+        await frames.aclose()
+
+    asyncio.run(consume_then_disconnect())
+    assert not response_cache
+
+
+def test_response_cache_evicts_least_recently_used(response_cache, monkeypatch):
+    monkeypatch.setattr(models, "RESPONSE_CACHE_SIZE", 2)
+    models._store_cached_response(b"a", "A")
+    models._store_cached_response(b"b", "B")
+    assert models._get_cached_response(b"a") == "A"
+
+    models._store_cached_response(b"c", "C")
+
+    assert models._get_cached_response(b"b") is None
+    assert list(response_cache) == [b"a", b"c"]
+
+
+def test_replay_splits_long_replies():
+    async def collect():
+        return [chunk async for chunk in models._replay_response(text)]
+
+    text = "x" * (models._REPLAY_CHUNK_CHARS * 2 + 1)
+    chunks = asyncio.run(collect())
+    assert len(chunks) == 3
+    assert "".join(chunks) == text
+
+
+class FrameSource:
+    """Yields the given frames, then optionally raises or stalls forever."""
+
+    def __init__(self, frames, gap=0.0, error=None, stall=False):
+        self.frames = frames
+        self.gap = gap
+        self.error = error
+        self.stall = stall
+        self.closed = False
+
+    async def __call__(self):
+        try:
+            for frame in self.frames:
+                yield frame
+                await asyncio.sleep(self.gap)
+            if self.error is not None:
+                raise self.error
+            if self.stall:
+                await asyncio.Event().wait()
+        finally:
+            self.closed = True
+
+
+async def _next(frames, timeout=1.0):
+    return await asyncio.wait_for(frames.__anext__(), timeout)
+
+
+def test_coalesce_passes_spaced_frames_through():
+    source = FrameSource([b"m", b"a", b"b", b"c"], gap=models._COALESCE_SECONDS * 4)
+
+    async def collect():
+        return [frame async for frame in models._coalesce(source())]
+
+    assert asyncio.run(collect()) == [b"m", b"a", b"b", b"c"]
+    assert source.closed
+
+
+def test_coalesce_flushes_burst_when_window_elapses(monkeypatch):
+    monkeypatch.setattr(models, "_COALESCE_SECONDS", 0.05)
+    source = FrameSource([b"m", b"t1", b"t2", b"t3"], stall=True)
+
+    async def run():
+        frames = models._coalesce(source())
+        # Neither the meta frame nor the first token waits for a window
+        assert await _next(frames, timeout=0.02) == b"m"
+        assert await _next(frames, timeout=0.02) == b"t1"
+        # The source is now stalled, so only the timer can flush the burst
+        assert await _next(frames) == b"t2t3"
+        await frames.aclose()
+
+    asyncio.run(run())
+    assert source.closed
+
+
+def test_coalesce_flushes_full_buffer_without_waiting(monkeypatch):
+    monkeypatch.setattr(models, "_COALESCE_SECONDS", 10.0)
+    monkeypatch.setattr(models, "_COALESCE_BYTES", 4)
+    source = FrameSource([b"m", b"aa", b"bb", b"cc", b"dd", b"ee"], stall=True)
+
+    async def run():
+        frames = models._coalesce(source())
+        batches = [await _next(frames) for _ in range(4)]
+        assert batches == [b"m", b"aa", b"bbcc", b"ddee"]
+        await frames.aclose()
+
+    asyncio.run(run())
+    assert source.closed
+
+
+def test_coalesce_flushes_buffer_before_error(monkeypatch):
+    monkeypatch.setattr(models, "_COALESCE_SECONDS", 10.0)
+    source = FrameSource([b"m", b"a", b"b"], error=ValueError("boom"))
+
+    async def run(out):
+        async for frame in models._coalesce(source()):
+            out.append(frame)
+
+    out = []
+    with pytest.raises(ValueError, match="boom"):
+        asyncio.run(run(out))
+    assert out == [b"m", b"a", b"b"]
+
+
+def test_coalesce_disconnect_mid_burst_closes_source(monkeypatch):
+    monkeypatch.setattr(models, "_COALESCE_SECONDS", 10.0)
+    source = FrameSource([b"m", b"a", b"b"], stall=True)
+
+    async def run():
+        frames = models._coalesce(source())
+        assert await _next(frames) == b"m"
+        assert await _next(frames) == b"a"
+        # "b" is buffered and a read is in flight when the client goes away
+        read = asyncio.ensure_future(frames.__anext__())
+        await asyncio.sleep(0.01)
+        read.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await read
+        await frames.aclose()
+
+    asyncio.run(run())
+    assert source.closed
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.providers import provider as provider_module
+from app.providers.provider import OpenSourceProvider
+
+
+def _chunk(content=None, finish_reason=None, role=None):
+    delta = {}
+    if role is not None:
+        delta["role"] = role
+    if content is not None:
+        delta["content"] = content
+    return {"choices": [{"delta": delta, "finish_reason": finish_reason}]}
+
+
+class FakeLlm:
+    def __init__(self, chunks, error=None, endless=False):
+        self.chunks = chunks
+        self.error = error
+        self.endless = endless
+        self.produced = 0
+        self.thread = None
+
+    def create_chat_completion(self, messages, stream, **kwargs):
+        assert stream
+        self.thread = threading.current_thread()
+        while True:
+            for chunk in self.chunks:
+                self.produced += 1
+                yield chunk
+            if self.error is not None:
+                raise self.error
+            if not self.endless:
+                return
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    # The bridge is exercised with FakeLlm, so the native build isn't needed
+    monkeypatch.setattr(provider_module, "HAS_LLAMA_CPP", True)
+    return OpenSourceProvider()
+
+
+def _stream(provider, llm, monkeypatch):
+    async def get_model(repo_id, filename):
+        return llm
+
+    monkeypatch.setattr(provider, "_get_model", get_model)
+    model = f"opensource:{provider.registry[0]['repo_id']}"
+    return provider.stream_chat(model, [{"role": "user", "content": "hi"}])
+
+
+def test_stream_chat_yields_content_until_finish(provider, monkeypatch):
+    llm = FakeLlm(
+        [
+            _chunk(role="assistant"),
+            _chunk("Hel"),
+            _chunk(""),
+            _chunk("lo", finish_reason="stop"),
+            _chunk("ignored"),
+        ]
+    )
+
+    async def collect():
+        return [delta async for delta in _stream(provider, llm, monkeypatch)]
+
+    assert asyncio.run(collect()) == ["Hel", "lo"]
+
+
+def test_stream_chat_raises_inference_errors(provider, monkeypatch):
+    llm = FakeLlm([_chunk("Hel")], error=ValueError("boom"))
+
+    async def collect(out):
+        async for delta in _stream(provider, llm, monkeypatch):
+            out.append(delta)
+
+    out = []
+    with pytest.raises(ValueError, match="boom"):
+        asyncio.run(collect(out))
+    assert out == ["Hel"]
+
+
+def test_closing_stream_stops_inference_thread(provider, monkeypatch):
+    llm = FakeLlm([_chunk("tok ")], endless=True)
+
+    async def consume_then_close():
+        stream = _stream(provider, llm, monkeypatch)
+        assert await stream.__anext__() == "tok "
+        await stream.aclose()
+
+    asyncio.run(consume_then_close())
+    llm.thread.join(timeout=1.0)
+    assert not llm.thread.is_alive()
+
+    produced = llm.produced
+    time.sleep(0.05)
+    assert llm.produced == produced
+
+
+class FakeLlama:
+    @classmethod
+    def from_pretrained(cls, repo_id, filename, **kwargs):
+        return cls()
+
+
+def test_model_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(provider_module, "HAS_LLAMA_CPP", True)
+    monkeypatch.setattr(provider_module, "Llama", FakeLlama)
+    provider = OpenSourceProvider(max_loaded_models=2)
+
+    a = provider._load_model("repo/a", "a.gguf")
+    provider._load_model("repo/b", "b.gguf")
+    assert provider._cached_model("repo/a:a.gguf") is a
+    provider._load_model("repo/c", "c.gguf")
+
+    assert list(provider._model_cache) == ["repo/a:a.gguf", "repo/c:c.gguf"]
+
+
+def test_model_cache_lookups_race_with_loads_and_deletes(monkeypatch):
+    monkeypatch.setattr(provider_module, "HAS_LLAMA_CPP", True)
+    monkeypatch.setattr(provider_module, "Llama", FakeLlama)
+    provider = OpenSourceProvider(max_loaded_models=2)
+    keys = [(f"repo/{i}", f"{i}.gguf") for i in range(4)]
+    errors = []
+
+    def churn():
+        try:
+            for n in range(2000):
+                repo_id, filename = keys[n % len(keys)]
+                provider._load_model(repo_id, filename)
+                provider._drop_model(f"{repo_id}:{filename}")
+        except Exception as exc:
+            errors.append(exc)
+
+    workers = [threading.Thread(target=churn) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    while any(worker.is_alive() for worker in workers):
+        for repo_id, filename in keys:
+            provider._cached_model(f"{repo_id}:{filename}")
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    assert len(provider._model_cache) <= 2